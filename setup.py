@@ -79,6 +79,7 @@ PYSTACK_EXTENSION = Extension(
         "src/pystack/_pystack/corefile.cpp",
         "src/pystack/_pystack/elf_common.cpp",
         "src/pystack/_pystack/logging.cpp",
+        "src/pystack/_pystack/maps_parser.cpp",
         "src/pystack/_pystack/mem.cpp",
         "src/pystack/_pystack/process.cpp",
         "src/pystack/_pystack/pycode.cpp",
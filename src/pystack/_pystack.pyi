@@ -54,6 +54,9 @@ def get_process_threads_for_core(
     method: StackMethod = StackMethod.AUTO,
 ) -> Iterable[PyThread]: ...
 def get_bss_info(binary: Union[str, pathlib.Path]) -> Dict[str, Any]: ...
+def parse_maps_data(
+    data: Union[bytes, memoryview],
+) -> List[Tuple[int, int, int, int, str, str, int, Optional[str]]]: ...
 def copy_memory_from_address(
     pid: int, address: int, size: int, blocking: bool = False
 ) -> bytes: ...
@@ -4,6 +4,7 @@ import functools
 import logging
 import os
 import pathlib
+import sys
 from typing import Any
 from typing import Callable
 from typing import Dict
@@ -22,6 +23,8 @@ from _pystack.elf_common cimport ProcessAnalyzer as NativeProcessAnalyzer
 from _pystack.elf_common cimport SectionInfo
 from _pystack.elf_common cimport getSectionInfo
 from _pystack.logging cimport initializePythonLoggerInterface
+from _pystack.maps_parser cimport ProcMapsLine
+from _pystack.maps_parser cimport parseProcMapsLine
 from _pystack.mem cimport AbstractRemoteMemoryManager
 from _pystack.mem cimport BlockingProcessMemoryManager
 from _pystack.mem cimport MemoryMapInformation as CppMemoryMapInformation
@@ -37,6 +40,9 @@ from _pystack.pyframe cimport FrameObject
 from _pystack.pythread cimport NativeThread
 from _pystack.pythread cimport Thread
 from _pystack.pythread cimport getThreadFromInterpreterState
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from libc.string cimport memchr
+from libc.string cimport memcmp
 from libcpp.memory cimport make_shared
 from libcpp.memory cimport make_unique
 from libcpp.memory cimport shared_ptr
@@ -178,6 +184,76 @@ def get_bss_info(binary):
         return result
     return None
 
+
+cdef extern from "Python.h":
+    object PyUnicode_DecodeFSDefaultAndSize(const char* s, Py_ssize_t size)
+
+
+cdef inline object _dedup_string(dict strings, object value):
+    return strings.setdefault(value, value)
+
+
+def parse_maps_data(const unsigned char[:] data not None):
+    cdef list result = []
+    cdef ProcMapsLine line
+    cdef const char* cursor
+    cdef const char* line_end
+    cdef Py_ssize_t remaining = data.shape[0]
+    cdef Py_ssize_t line_size
+    # Devices, permissions and paths repeat a lot across the lines, so share
+    # a single string for each distinct value. Consecutive lines usually
+    # belong to the same file, so the last path is checked before decoding.
+    cdef dict strings = {}
+    cdef const char* last_path = NULL
+    cdef size_t last_path_size = 0
+    last_path_obj = None
+    if remaining == 0:
+        return result
+
+    cursor = <const char*> &data[0]
+    while remaining > 0:
+        line_end = <const char*> memchr(cursor, b"\n", remaining)
+        line_size = line_end - cursor if line_end != NULL else remaining
+        if parseProcMapsLine(cursor, line_size, &line):
+            if line.path == NULL:
+                path = None
+            elif (
+                last_path != NULL
+                and line.path_size == last_path_size
+                and memcmp(line.path, last_path, last_path_size) == 0
+            ):
+                path = last_path_obj
+            else:
+                path = _dedup_string(
+                    strings,
+                    sys.intern(
+                        PyUnicode_DecodeFSDefaultAndSize(line.path, line.path_size)
+                    ),
+                )
+                last_path = line.path
+                last_path_size = line.path_size
+                last_path_obj = path
+            result.append(
+                (
+                    line.start,
+                    line.end,
+                    line.filesize,
+                    line.offset,
+                    _dedup_string(strings, line.device[:line.device_size]),
+                    _dedup_string(strings, line.flags[:line.flags_size]),
+                    line.inode,
+                    path,
+                )
+            )
+        else:
+            LOGGER.debug(
+                "Line %r cannot be recognized!",
+                PyBytes_FromStringAndSize(cursor, line_size),
+            )
+        cursor += line_size + 1
+        remaining -= line_size + 1
+    return result
+
 ######################
 # MANAGEMENT CLASSES #
 ######################
@@ -0,0 +1,222 @@
+#include <array>
+#include <cstring>
+
+#include "maps_parser.h"
+
+namespace pystack {
+
+static const char DELETED_SUFFIX[] = " (deleted)";
+static const size_t DELETED_SUFFIX_SIZE = sizeof(DELETED_SUFFIX) - 1;
+
+static inline bool
+isBlank(char c)
+{
+    return c == ' ' || c == '\t';
+}
+
+static inline bool
+isSpace(char c)
+{
+    return isBlank(c) || c == '\n' || c == '\r' || c == '\v' || c == '\f';
+}
+
+static constexpr int8_t INVALID_HEX_DIGIT = -1;
+
+static constexpr std::array<int8_t, 256>
+makeHexDigitTable()
+{
+    std::array<int8_t, 256> table{};
+    for (auto& entry : table) {
+        entry = INVALID_HEX_DIGIT;
+    }
+    for (int c = '0'; c <= '9'; ++c) {
+        table[c] = static_cast<int8_t>(c - '0');
+    }
+    for (int c = 'a'; c <= 'f'; ++c) {
+        table[c] = static_cast<int8_t>(c - 'a' + 10);
+    }
+    for (int c = 'A'; c <= 'F'; ++c) {
+        table[c] = static_cast<int8_t>(c - 'A' + 10);
+    }
+    return table;
+}
+
+// Looking characters up in a table avoids a chain of range checks for each.
+static constexpr std::array<int8_t, 256> HEX_DIGITS = makeHexDigitTable();
+
+// Converts 8 ASCII hex digits loaded as a little-endian word (that is, with
+// the most significant digit in the lowest byte) into their value, working
+// on all the digits at once instead of branching on every character.
+static inline uint64_t
+parseHex8(uint64_t chunk)
+{
+    // '0'-'9' have bit 6 clear and their value in the low nibble, while
+    // 'a'-'f' and 'A'-'F' have it set and their value minus 9 there.
+    chunk = (chunk & 0x0F0F0F0F0F0F0F0FULL) + 9 * ((chunk & 0x4040404040404040ULL) >> 6);
+    // Merge neighbouring nibbles, then bytes and then 16-bit halves.
+    chunk = ((chunk << 4) | (chunk >> 8)) & 0x00FF00FF00FF00FFULL;
+    chunk = ((chunk << 8) | (chunk >> 16)) & 0x0000FFFF0000FFFFULL;
+    chunk = ((chunk << 16) | (chunk >> 32)) & 0x00000000FFFFFFFFULL;
+    return chunk;
+}
+
+static bool
+parseHex(const char** cursor, const char* end, uint64_t* result)
+{
+    const char* start = *cursor;
+    const char* p = start;
+    while (p < end && HEX_DIGITS[static_cast<unsigned char>(*p)] != INVALID_HEX_DIGIT) {
+        ++p;
+    }
+    // Reject empty fields and values that do not fit in 64 bits.
+    size_t size = p - start;
+    if (size == 0 || size > 16) {
+        return false;
+    }
+
+#if defined(__BYTE_ORDER__) && __BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__
+    // Right-align the digits in a zero-padded 16 character buffer so that
+    // every field can be converted as two fixed-size 8 digit chunks.
+    char digits[16];
+    std::memset(digits, '0', sizeof(digits));
+    std::memcpy(digits + sizeof(digits) - size, start, size);
+    uint64_t high;
+    uint64_t low;
+    std::memcpy(&high, digits, 8);
+    std::memcpy(&low, digits + 8, 8);
+    uint64_t value = (parseHex8(high) << 32) | parseHex8(low);
+#else
+    uint64_t value = 0;
+    for (const char* digit = start; digit < p; ++digit) {
+        value = (value << 4) | static_cast<uint64_t>(HEX_DIGITS[static_cast<unsigned char>(*digit)]);
+    }
+#endif
+
+    *cursor = p;
+    *result = value;
+    return true;
+}
+
+static bool
+parseDecimal(const char** cursor, const char* end, uint64_t* result)
+{
+    const char* p = *cursor;
+    uint64_t value = 0;
+    while (p < end && *p >= '0' && *p <= '9') {
+        uint64_t digit = static_cast<uint64_t>(*p - '0');
+        if (value > (UINT64_MAX - digit) / 10) {
+            return false;
+        }
+        value = value * 10 + digit;
+        ++p;
+    }
+    if (p == *cursor) {
+        return false;
+    }
+    *cursor = p;
+    *result = value;
+    return true;
+}
+
+static bool
+skipBlanks(const char** cursor, const char* end)
+{
+    const char* p = *cursor;
+    while (p < end && isBlank(*p)) {
+        ++p;
+    }
+    if (p == *cursor) {
+        return false;
+    }
+    *cursor = p;
+    return true;
+}
+
+bool
+parseProcMapsLine(const char* line, size_t size, ProcMapsLine* result)
+{
+    // Every line has the form:
+    //
+    //   start-end perms offset dev inode [pathname]
+    //
+    // The first five fields never contain whitespace while the pathname may,
+    // so everything after the inode is taken verbatim.
+    const char* p = line;
+    const char* end = line + size;
+    while (end > p && isSpace(end[-1])) {
+        --end;
+    }
+    while (p < end && isSpace(*p)) {
+        ++p;
+    }
+
+    uint64_t value;
+    if (!parseHex(&p, end, &value)) {
+        return false;
+    }
+    result->start = value;
+    if (p == end || *p++ != '-' || !parseHex(&p, end, &value)) {
+        return false;
+    }
+    if (value < result->start) {
+        return false;
+    }
+    result->end = value;
+    result->filesize = value - result->start;
+
+    if (!skipBlanks(&p, end)) {
+        return false;
+    }
+    const char* flags = p;
+    while (p < end && !isBlank(*p)) {
+        ++p;
+    }
+    if (p - flags != 4) {
+        return false;
+    }
+    result->flags = flags;
+    result->flags_size = 4;
+
+    if (!skipBlanks(&p, end) || !parseHex(&p, end, &value)) {
+        return false;
+    }
+    result->offset = value;
+
+    if (!skipBlanks(&p, end)) {
+        return false;
+    }
+    const char* device = p;
+    while (p < end && !isBlank(*p)) {
+        ++p;
+    }
+    if (std::memchr(device, ':', p - device) == nullptr) {
+        return false;
+    }
+    result->device = device;
+    result->device_size = p - device;
+
+    if (!skipBlanks(&p, end) || !parseDecimal(&p, end, &value)) {
+        return false;
+    }
+    result->inode = value;
+
+    result->path = nullptr;
+    result->path_size = 0;
+    if (p == end) {
+        return true;
+    }
+    if (!skipBlanks(&p, end)) {
+        return false;
+    }
+    size_t path_size = end - p;
+    if (path_size >= DELETED_SUFFIX_SIZE
+        && std::memcmp(end - DELETED_SUFFIX_SIZE, DELETED_SUFFIX, DELETED_SUFFIX_SIZE) == 0)
+    {
+        path_size -= DELETED_SUFFIX_SIZE;
+    }
+    result->path = p;
+    result->path_size = path_size;
+    return true;
+}
+
+}  // namespace pystack
@@ -0,0 +1,28 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+
+namespace pystack {
+
+// A single line of /proc/<pid>/maps. The string fields point into the line
+// that was parsed, so they are only valid for as long as that buffer is.
+struct ProcMapsLine
+{
+    uintptr_t start;
+    uintptr_t end;
+    uintptr_t filesize;
+    unsigned long offset;
+    const char* device;
+    size_t device_size;
+    const char* flags;
+    size_t flags_size;
+    unsigned long inode;
+    const char* path;
+    size_t path_size;
+};
+
+bool
+parseProcMapsLine(const char* line, size_t size, ProcMapsLine* result);
+
+}  // namespace pystack
@@ -0,0 +1,18 @@
+from libc.stdint cimport uintptr_t
+
+
+cdef extern from "maps_parser.h" namespace "pystack":
+    struct ProcMapsLine:
+        uintptr_t start
+        uintptr_t end
+        uintptr_t filesize
+        unsigned long offset
+        const char* device
+        size_t device_size
+        const char* flags
+        size_t flags_size
+        unsigned long inode
+        const char* path
+        size_t path_size
+
+    bint parseProcMapsLine(const char* line, size_t size, ProcMapsLine* result)
@@ -1,14 +1,24 @@
+import array
+import bisect
 import collections
 import dataclasses
+import functools
 import logging
+import operator
 import os
-import re
+import sys
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Tuple
+from typing import Union
 
 from .errors import MissingExecutableMaps
 from .errors import ProcessNotFound
@@ -16,31 +26,63 @@ from .errors import PystackError
 
 LOGGER = logging.getLogger(__file__)
 
-MAPS_REGEXP = re.compile(
-    r"""
-    (?P<start>[\da-f]+)
-    -
-    (?P<end>[\da-f]+)
-    \s
-    (?P<permissions>....)
-    \s
-    (?P<offset>[\da-f]+)
-    \s
-    (?P<dev>[\da-f][\da-f]+:[\da-f][\da-f]+)
-    \s
-    (?P<inode>\d+)
-    \s*
-    (?P<pathname>.+)?
-    $
-    """,
-    re.VERBOSE,
+DELETED_SUFFIX = " (deleted)"
+
+# Pseudo-paths of the maps the kernel injects into every process. They sit far
+# away from the rest of the address space and must not widen the memory range.
+VSYSCALL_MAP_NAMES = frozenset(
+    ("[vdso]", "[vvar]", "[vvar_vclock]", "[vsyscall]", "[vsso]")
 )
+HEAP_MAP_NAME = "[heap]"
+LIBPYTHON_NAME = "libpython"
+
+FLAG_READ = 1
+FLAG_WRITE = 2
+FLAG_EXECUTE = 4
+FLAG_PRIVATE = 8
 
 RawCoreMapList = List[Dict[str, Any]]
+# The fields of a line of /proc/<pid>/maps, in the order of VirtualMap's fields:
+# (start, end, filesize, offset, device, flags, inode, path)
+MapsLine = Tuple[int, int, int, int, str, str, int, Optional[str]]
+# Bytes a line of /proc/<pid>/maps can start with.
+_HEX_DIGITS = frozenset(b"0123456789abcdefABCDEF")
+
+
+@functools.lru_cache(maxsize=None)
+def _flags_to_bits(flags: str) -> int:
+    # Processes only ever use a handful of distinct permission strings, so
+    # each of them is translated to its bitmask exactly once.
+    bits = 0
+    if "r" in flags:
+        bits |= FLAG_READ
+    if "w" in flags:
+        bits |= FLAG_WRITE
+    if "x" in flags:
+        bits |= FLAG_EXECUTE
+    if "p" in flags:
+        bits |= FLAG_PRIVATE
+    return bits
 
 
 @dataclasses.dataclass(frozen=True, eq=True)
 class VirtualMap:
+    # Processes can have thousands of maps, so avoid a per-instance __dict__.
+    # The bitmask in _flag_bits is derived from flags and _path_obj memoizes
+    # path_obj: neither of them is a field.
+    __slots__ = (
+        "start",
+        "end",
+        "filesize",
+        "offset",
+        "device",
+        "flags",
+        "inode",
+        "path",
+        "_flag_bits",
+        "_path_obj",
+    )
+
     start: int
     end: int
     filesize: int
@@ -48,27 +90,67 @@ class VirtualMap:
     device: str
     flags: str
     inode: int
-    path: Optional[Path]
+    path: Optional[str]
+
+    if TYPE_CHECKING:
+        _flag_bits: int = dataclasses.field(init=False, compare=False)
+        _path_obj: Optional[Path] = dataclasses.field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.path is not None and not isinstance(self.path, str):
+            object.__setattr__(self, "path", os.fspath(self.path))
+        object.__setattr__(self, "_flag_bits", _flags_to_bits(self.flags))
+        object.__setattr__(self, "_path_obj", None)
+
+    @classmethod
+    def _from_tuple(cls, fields: MapsLine) -> "VirtualMap":
+        # Builds a map from a line returned by the maps parsers, passing the
+        # fields positionally to avoid keyword argument matching in __init__.
+        return cls(*fields)
+
+    def __reduce__(self) -> Any:
+        # Frozen instances with __slots__ cannot be restored attribute by
+        # attribute, so copy and pickle go through the constructor instead.
+        return (
+            type(self),
+            (
+                self.start,
+                self.end,
+                self.filesize,
+                self.offset,
+                self.device,
+                self.flags,
+                self.inode,
+                self.path,
+            ),
+        )
 
     def contains(self, addr: int) -> bool:
         return self.start <= addr < self.end
 
     def is_executable(self) -> bool:
-        return "x" in self.flags
+        return bool(self._flag_bits & FLAG_EXECUTE)
 
     def is_readable(self) -> bool:
-        return "r" in self.flags
+        return bool(self._flag_bits & FLAG_READ)
 
     def is_writable(self) -> bool:
-        return "w" in self.flags
+        return bool(self._flag_bits & FLAG_WRITE)
 
     def is_private(self) -> bool:
-        return "p" in self.flags
+        return bool(self._flag_bits & FLAG_PRIVATE)
 
     @property
     def size(self) -> int:
         return self.end - self.start
 
+    @property
+    def path_obj(self) -> Optional[Path]:
+        # Most paths are only ever compared, so the Path is built on demand.
+        if self._path_obj is None and self.path is not None:
+            object.__setattr__(self, "_path_obj", Path(self.path))
+        return self._path_obj
+
     def __repr__(self):
         start = f"0x{self.start:016x}"
         end = f"0x{self.end:016x}"
@@ -87,6 +169,47 @@ class MemoryRange:
     max_addr: int
 
 
+class MapTable:
+    """All the maps of a process, indexed by address.
+
+    Maps never overlap, so the only candidate to contain an address is the
+    last map that starts at or before it, which bisection finds in O(log n).
+
+    The fields that lookups need are also kept column-wise in compact arrays,
+    so queries only touch the VirtualMap objects they end up returning.
+    """
+
+    def __init__(self, maps: Iterable[VirtualMap]) -> None:
+        self._maps = sorted(maps, key=operator.attrgetter("start"))
+        self._starts = array.array("Q", (vmap.start for vmap in self._maps))
+        self._ends = array.array("Q", (vmap.end for vmap in self._maps))
+        self._flags = array.array("B", (vmap._flag_bits for vmap in self._maps))
+        self._paths = [vmap.path for vmap in self._maps]
+
+    def __len__(self) -> int:
+        return len(self._maps)
+
+    def __iter__(self) -> Iterator[VirtualMap]:
+        return iter(self._maps)
+
+    def __getitem__(self, index: int) -> VirtualMap:
+        return self._maps[index]
+
+    def find(self, addr: int) -> Optional[VirtualMap]:
+        index = bisect.bisect_right(self._starts, addr) - 1
+        if index < 0 or addr >= self._ends[index]:
+            return None
+        return self._maps[index]
+
+    def find_all(
+        self, flags: int = 0, path: Optional[str] = None
+    ) -> Iterator[VirtualMap]:
+        """Yield the maps that have all the given FLAG_* bits and path."""
+        for index, (map_flags, map_path) in enumerate(zip(self._flags, self._paths)):
+            if map_flags & flags == flags and (path is None or map_path == path):
+                yield self._maps[index]
+
+
 @dataclasses.dataclass
 class MemoryMapInformation:
     memory: MemoryRange
@@ -94,36 +217,158 @@ class MemoryMapInformation:
     bss: Optional[VirtualMap]
     python: VirtualMap
     libpython: Optional[VirtualMap]
+    maps: Optional[MapTable] = None
+
+
+# Maps of the processes read with use_cache=True, keyed by pid.
+_MAPS_CACHE: Dict[int, List[VirtualMap]] = {}
 
 
-def _read_maps(pid: int) -> List[str]:
+# Scratch buffer that the maps files are read into, so that repeated scans
+# (e.g. when sampling a process in a loop) do not allocate a new bytes object
+# every time. It is never resized, so views of it can be handed out freely
+# while _SCRATCH_LOCK is held.
+_SCRATCH_SIZE = 1 << 20
+_SCRATCH = bytearray(_SCRATCH_SIZE)
+_SCRATCH_LOCK = threading.Lock()
+
+
+def _read_maps(pid: int, buffer: memoryview) -> Union[bytes, memoryview]:
+    # The kernel generates the file on every read, so slurp it unbuffered in
+    # one go and let the parser split it afterwards instead of iterating.
+    # This returns a view of the filled part of the buffer, or a new bytes
+    # object if the file does not fit in it.
     try:
-        with open(f"/proc/{pid}/maps") as maps:
-            return maps.readlines()
+        with open(f"/proc/{pid}/maps", "rb", buffering=0) as maps:
+            size = 0
+            while size < len(buffer):
+                read = maps.readinto(buffer[size:])
+                if not read:
+                    return buffer[:size]
+                size += read
+            return bytes(buffer) + maps.read()
     except FileNotFoundError:
         raise ProcessNotFound(f"No such process id: {pid}") from None
 
 
-def generate_maps_for_process(pid: int) -> Iterable[VirtualMap]:
-    proc_maps_lines = _read_maps(pid)
-    for index, line in enumerate(proc_maps_lines):
-        line = line.rstrip("\n")
-        match = MAPS_REGEXP.match(line)
-        if not match:
+def _strip_deleted_suffix(path: str) -> str:
+    # The kernel appends this marker to the paths of mapped files (and of the
+    # /proc/<pid>/exe link) that have been unlinked since they were mapped.
+    if path.endswith(DELETED_SUFFIX):
+        return path[: -len(DELETED_SUFFIX)]
+    return path
+
+
+def _decode_field(decoded: Dict[bytes, str], field: bytes) -> str:
+    # Devices, permissions and paths repeat across the lines of a maps file,
+    # so every distinct value is decoded once and the same string is shared.
+    value = decoded.get(field)
+    if value is None:
+        value = decoded[field] = sys.intern(os.fsdecode(field))
+    return value
+
+
+def _parse_maps_line(line: bytes, decoded: Dict[bytes, str]) -> Optional[MapsLine]:
+    # Every line of /proc/<pid>/maps has the form:
+    #
+    #   start-end perms offset dev inode [pathname]
+    #
+    # The first five fields never contain whitespace, so a single bounded
+    # split gives us all of them, leaving the (optional) pathname intact even
+    # if it contains spaces itself.
+    #
+    # Before splitting, cheaply reject lines that cannot start with an address
+    # range: the first byte must be a hex digit and, as an address has at most
+    # 16 digits, the "-" after it must be within the first 17 bytes.
+    if not line or line[0] not in _HEX_DIGITS or b"-" not in line[:17]:
+        return None
+    fields = line.split(None, 5)
+    if len(fields) < 5:
+        return None
+    address_range, permissions, offset, device, inode = fields[:5]
+    start, sep, end = address_range.partition(b"-")
+    if not sep or len(permissions) != 4 or b":" not in device:
+        return None
+    try:
+        start_addr = int(start, 16)
+        end_addr = int(end, 16)
+        offset_value = int(offset, 16)
+        inode_value = int(inode)
+    except ValueError:
+        return None
+    if end_addr < start_addr:
+        return None
+
+    path = None
+    if len(fields) == 6:
+        path = _strip_deleted_suffix(_decode_field(decoded, fields[5]))
+
+    return (
+        start_addr,
+        end_addr,
+        end_addr - start_addr,
+        offset_value,
+        _decode_field(decoded, device),
+        _decode_field(decoded, permissions),
+        inode_value,
+        path,
+    )
+
+
+def _parse_maps_data(data: Union[bytes, memoryview]) -> List[MapsLine]:
+    result = []
+    decoded: Dict[bytes, str] = {}
+    for line in bytes(data).splitlines():
+        line = line.strip()
+        fields = _parse_maps_line(line, decoded)
+        if fields is None:
             LOGGER.debug("Line %r cannot be recognized!", line)
             continue
+        result.append(fields)
+    return result
 
-        path = match.group("pathname")
-        yield VirtualMap(
-            start=int(match.group("start"), 16),
-            end=int(match.group("end"), 16),
-            filesize=int(match.group("end"), 16) - int(match.group("start"), 16),
-            offset=int(match.group("offset"), 16),
-            device=match.group("dev"),
-            flags=match.group("permissions"),
-            inode=int(match.group("inode")),
-            path=Path(path) if path else None,
-        )
+
+@functools.lru_cache(maxsize=None)
+def _get_maps_parser() -> Callable[[Union[bytes, memoryview]], List[MapsLine]]:
+    # Lazy import _pystack to overcome a circular-import. The native parser
+    # is an order of magnitude faster, but the pure Python one produces the
+    # same output and keeps this module usable without the extension.
+    try:
+        from ._pystack import parse_maps_data
+    except ImportError:
+        return _parse_maps_data
+    return parse_maps_data
+
+
+def _read_and_parse_maps(pid: int) -> List[VirtualMap]:
+    parse_maps_data = _get_maps_parser()
+    # The parsers copy everything they keep out of the buffer, so it can be
+    # reused as soon as they return.
+    with _SCRATCH_LOCK:
+        lines = parse_maps_data(_read_maps(pid, memoryview(_SCRATCH)))
+    return [VirtualMap._from_tuple(fields) for fields in lines]
+
+
+def generate_maps_for_process(
+    pid: int, *, use_cache: bool = False
+) -> Iterable[VirtualMap]:
+    if not use_cache:
+        return _read_and_parse_maps(pid)
+    # The kernel offers no cheap way to know if the maps of a process changed
+    # (the mtime of the file in /proc is not updated), so cached maps are
+    # only refreshed when the caller invalidates them.
+    maps = _MAPS_CACHE.get(pid)
+    if maps is None:
+        maps = _MAPS_CACHE[pid] = _read_and_parse_maps(pid)
+    return list(maps)
+
+
+def invalidate_maps(pid: Optional[int] = None) -> None:
+    """Forget the cached maps of the given process, or of all of them."""
+    if pid is None:
+        _MAPS_CACHE.clear()
+    else:
+        _MAPS_CACHE.pop(pid, None)
 
 
 def generate_maps_from_core_data(
@@ -170,15 +415,29 @@ def generate_maps_from_core_data(
             device=data_elem["device"],
             flags=data_elem["flags"],
             inode=data_elem["inode"],
-            path=path,
+            path=str(path) if path is not None else None,
         )
 
 
 def parse_maps_file(pid: int, all_maps: Iterable[VirtualMap]) -> MemoryMapInformation:
-    binary_name = Path(os.readlink(f"/proc/{pid}/exe"))
+    binary_name = Path(_strip_deleted_suffix(os.readlink(f"/proc/{pid}/exe")))
     return parse_maps_file_for_binary(binary_name, all_maps)
 
 
+def find_binary_map(
+    binary_name: Path, all_maps: Iterable[VirtualMap]
+) -> Optional[VirtualMap]:
+    # Same map that parse_maps_file_for_binary reports as "python", for the
+    # callers that need nothing else: this stops at the first match instead
+    # of having to go through every map of the process.
+    name = binary_name.name
+    for memory_range in all_maps:
+        path = memory_range.path
+        if path is not None and os.path.basename(path) == name:
+            return memory_range
+    return None
+
+
 def _get_base_map(binary_maps: List[VirtualMap]) -> VirtualMap:
     maybe_map = next(
         (map for map in binary_maps if map.path is not None),
@@ -214,7 +473,9 @@ def _get_bss(elf_maps: List[VirtualMap], load_point: int) -> Optional[VirtualMap
     # is only present in the core (and not in the original ELF) so this
     # operation allows us to correlate the bss section with some memory location
     # within the core file.
-    first_matching_map = next((map for map in elf_maps if map.contains(start)), None)
+    first_matching_map = next(
+        (map for map in elf_maps if map.start <= start < map.end), None
+    )
     if first_matching_map is None:
         return None
 
@@ -242,38 +503,53 @@ def parse_maps_file_for_binary(
     max_addr = 0
     maps_by_library: Dict[str, List[VirtualMap]] = collections.defaultdict(list)
     current_lib = ""
-    all_maps = tuple(all_maps_iter)
+    heap = None
+    all_maps = []
 
+    compute_load_points = load_point_by_module is None
     if load_point_by_module is None:
         load_point_by_module = collections.defaultdict(lambda: 2**64)
-        for memory_range in all_maps:
-            if memory_range.path is not None:
-                load_point_by_module[memory_range.path.name] = min(
-                    memory_range.start,
-                    load_point_by_module[memory_range.path.name],
-                )
 
-    for memory_range in all_maps:
-        current_lib = (
-            memory_range.path.name if memory_range.path is not None else current_lib
-        )
+    # Everything we need from the full list of maps is gathered in this single
+    # pass: the maps grouped by the library that owns them (anonymous maps
+    # belong to the last named map before them), the load point of every
+    # module, the heap and the range of addresses spanned by the process.
+    last_path = None
+    is_vsyscall_lib = False
+    for memory_range in all_maps_iter:
+        all_maps.append(memory_range)
+        path = memory_range.path
+        if path is not None:
+            # Consecutive maps mostly share the same (interned) path, so the
+            # library name is only recomputed and classified when it changes.
+            if path != last_path:
+                last_path = path
+                current_lib = os.path.basename(path)
+                is_vsyscall_lib = current_lib in VSYSCALL_MAP_NAMES
+            if compute_load_points:
+                if memory_range.start < load_point_by_module[current_lib]:
+                    load_point_by_module[current_lib] = memory_range.start
+            if current_lib == HEAP_MAP_NAME:
+                heap = memory_range
         maps_by_library[current_lib].append(memory_range)
 
-        if memory_range.path is None or not memory_range.path.name.startswith("[v"):
-            min_addr = min(min_addr, memory_range.start)
-            max_addr = max(max_addr, memory_range.end)
+        if path is None or not is_vsyscall_lib:
+            if memory_range.start < min_addr:
+                min_addr = memory_range.start
+            if memory_range.end > max_addr:
+                max_addr = memory_range.end
     maps_by_library = dict(maps_by_library)
 
-    python = libpython = bss = heap = None
+    python = libpython = bss = None
     try:
         binary_maps = maps_by_library[binary_name.name]
         python = _get_base_map(binary_maps)
     except KeyError:
         LOGGER.debug("Unable to find maps for %r in %r", binary_name, maps_by_library)
         available_maps = {
-            str(map.path)
+            map.path
             for map in all_maps
-            if map.path is not None and ".so" not in map.path.name
+            if map.path is not None and ".so" not in os.path.basename(map.path)
         }
         LOGGER.debug("Available executable maps: %s", ", ".join(available_maps))
         if available_maps:
@@ -286,7 +562,7 @@ def parse_maps_file_for_binary(
         )
     LOGGER.info("python binary first map found: %r", python)
 
-    libpython_binaries = [lib for lib in maps_by_library if "libpython" in lib]
+    libpython_binaries = [lib for lib in maps_by_library if LIBPYTHON_NAME in lib]
     if len(libpython_binaries) > 1:
         raise PystackError(
             f"Unexpectedly found multiple libpython in process: {libpython_binaries}"
@@ -304,9 +580,7 @@ def parse_maps_file_for_binary(
         libpython = None
         load_point = load_point_by_module[binary_name.name]
 
-    heap_maps = maps_by_library.get("[heap]")
-    if heap_maps is not None:
-        *_, heap = [m for m in heap_maps if getattr(m.path, "name", None) == "[heap]"]
+    if heap is not None:
         LOGGER.info("Heap map found: %r", heap)
 
     bss = _get_bss(elf_maps, load_point)
@@ -323,4 +597,6 @@ def parse_maps_file_for_binary(
         LOGGER.info("bss map found: %r", bss)
 
     memory = MemoryRange(min_addr=int(min_addr), max_addr=int(max_addr))
-    return MemoryMapInformation(memory, heap, bss, python, libpython)
+    return MemoryMapInformation(
+        memory, heap, bss, python, libpython, MapTable(all_maps)
+    )
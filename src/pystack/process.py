@@ -58,25 +58,26 @@ def _get_python_version_from_map_information(
     mapinfo: MemoryMapInformation,
 ) -> Tuple[int, int]:
     match = None
-    assert mapinfo.python.path is not None
+    assert mapinfo.python.path_obj is not None
     if mapinfo.libpython:
-        assert mapinfo.libpython.path is not None
+        assert mapinfo.libpython.path_obj is not None
         LOGGER.info(
-            "Trying to extract version from filename: %s", mapinfo.libpython.path.name
+            "Trying to extract version from filename: %s",
+            mapinfo.libpython.path_obj.name,
         )
-        match = LIBPYTHON_REGEXP.match(mapinfo.libpython.path.name)
+        match = LIBPYTHON_REGEXP.match(mapinfo.libpython.path_obj.name)
     else:
         LOGGER.info(
-            "Trying to extract version from filename: %s", mapinfo.python.path.name
+            "Trying to extract version from filename: %s", mapinfo.python.path_obj.name
         )
-        match = BINARY_REGEXP.match(mapinfo.python.path.name)
+        match = BINARY_REGEXP.match(mapinfo.python.path_obj.name)
     if match is None:
         LOGGER.info(
             "Could not find version by looking at library or binary path: "
             "Trying to get it from running python --version"
         )
         output = subprocess.check_output(
-            [mapinfo.python.path, "--version"], text=True, stderr=subprocess.STDOUT
+            [mapinfo.python.path_obj, "--version"], text=True, stderr=subprocess.STDOUT
         )
         match = VERSION_REGEXP.match(output)
     if not match:
@@ -1,8 +1,8 @@
 import shutil
 import subprocess
 import sys
+from io import BytesIO
 from pathlib import Path
-from unittest.mock import mock_open
 from unittest.mock import patch
 
 import pytest
@@ -11,7 +11,6 @@ from pystack.engine import NativeReportingMode
 from pystack.engine import StackMethod
 from pystack.engine import get_process_threads
 from pystack.errors import NotEnoughInformation
-from pystack.maps import MAPS_REGEXP
 from pystack.types import LocationInfo
 from pystack.types import NativeFrame
 from pystack.types import frame_type
@@ -326,14 +325,10 @@ def test_gather_stack_with_heap_fails_if_no_heap(tmpdir):
         the_data = []
         with open(f"/proc/{child_process.pid}/maps") as f:
             for line in f.readlines():
-                match = MAPS_REGEXP.match(line)
-                if not match:
-                    continue
-                if match.group("pathname") and "[heap]" in match.group("pathname"):
-                    line = line.replace("[heap]", "[mysterious_segment]")
+                line = line.replace("[heap]", "[mysterious_segment]")
                 the_data.append(line)
-        data = "".join(the_data)
-        with patch("builtins.open", mock_open(read_data=data)):
+        data = "".join(the_data).encode()
+        with patch("builtins.open", side_effect=lambda *args, **kwargs: BytesIO(data)):
 
             # THEN
 
@@ -354,18 +349,16 @@ def test_gather_stack_with_bss_fails_if_no_bss(tmpdir):
         the_data = []
         with open(f"/proc/{child_process.pid}/maps") as f:
             for line in f.readlines():
-                match = MAPS_REGEXP.match(line)
-                if not match:
-                    continue
-                if not match.group("pathname"):
-                    line = line.replace("\n", "[mysterious_segment]\n")
+                # Anonymous maps only have the 5 fields that precede the path
+                if len(line.split()) == 5:
+                    line = line.replace("\n", " [mysterious_segment]\n")
                 the_data.append(line)
 
-        data = "".join(the_data)
+        data = "".join(the_data).encode()
 
-        with patch("builtins.open", mock_open(read_data=data)), patch(
-            "pystack.maps._get_bss", return_value=None
-        ):
+        with patch(
+            "builtins.open", side_effect=lambda *args, **kwargs: BytesIO(data)
+        ), patch("pystack.maps._get_bss", return_value=None):
             # THEN
 
             with pytest.raises(NotEnoughInformation):
@@ -386,16 +379,14 @@ def test_gather_stack_auto_works_if_no_bss(tmpdir):
         the_data = []
         with open(f"/proc/{child_process.pid}/maps") as f:
             for line in f.readlines():
-                match = MAPS_REGEXP.match(line)
-                if not match:
-                    continue
-                if not match.group("pathname"):
-                    line = line.replace("\n", "[mysterious_segment]\n")
+                # Anonymous maps only have the 5 fields that precede the path
+                if len(line.split()) == 5:
+                    line = line.replace("\n", " [mysterious_segment]\n")
                 the_data.append(line)
-        data = "".join(the_data)
-        with patch("builtins.open", mock_open(read_data=data)), patch(
-            "pystack.maps._get_bss", return_value=None
-        ):
+        data = "".join(the_data).encode()
+        with patch(
+            "builtins.open", side_effect=lambda *args, **kwargs: BytesIO(data)
+        ), patch("pystack.maps._get_bss", return_value=None):
             threads = list(
                 get_process_threads(
                     child_process.pid, stop_process=True, method=StackMethod.AUTO
@@ -433,14 +424,10 @@ def test_gather_stack_auto_works_if_no_heap(tmpdir):
         the_data = []
         with open(f"/proc/{child_process.pid}/maps") as f:
             for line in f.readlines():
-                match = MAPS_REGEXP.match(line)
-                if not match:
-                    continue
-                if match.group("pathname") and "[heap]" in match.group("pathname"):
-                    line = line.replace("[heap]", "[mysterious_segment]")
+                line = line.replace("[heap]", "[mysterious_segment]")
                 the_data.append(line)
-        data = "".join(the_data)
-        with patch("builtins.open", mock_open(read_data=data)):
+        data = "".join(the_data).encode()
+        with patch("builtins.open", side_effect=lambda *args, **kwargs: BytesIO(data)):
             threads = list(
                 get_process_threads(
                     child_process.pid, stop_process=True, method=StackMethod.AUTO
@@ -1,5 +1,7 @@
+import copy
+import dataclasses
+from io import BytesIO
 from pathlib import Path
-from unittest.mock import mock_open
 from unittest.mock import patch
 
 import pytest
@@ -7,11 +9,26 @@ import pytest
 from pystack.errors import MissingExecutableMaps
 from pystack.errors import ProcessNotFound
 from pystack.errors import PystackError
+from pystack.maps import FLAG_EXECUTE
+from pystack.maps import FLAG_READ
+from pystack.maps import FLAG_WRITE
 from pystack.maps import VirtualMap
+from pystack.maps import _parse_maps_data
+from pystack.maps import find_binary_map
 from pystack.maps import generate_maps_for_process
+from pystack.maps import invalidate_maps
 from pystack.maps import parse_maps_file_for_binary
 
 
+def _fake_open(data: bytes):
+    """Patch ``open`` so that every call returns a new in-memory file.
+
+    Unlike ``mock_open``, the returned ``BytesIO`` objects implement the whole
+    binary file interface (``readinto`` included) at C speed.
+    """
+    return patch("builtins.open", side_effect=lambda *args, **kwargs: BytesIO(data))
+
+
 def test_virtual_map():
     # GIVEN
 
@@ -36,6 +53,74 @@ def test_virtual_map():
     assert map.is_writable()
 
 
+def test_virtual_map_without_permissions():
+    # GIVEN
+
+    map = VirtualMap(
+        start=0,
+        end=10,
+        offset=1234,
+        device="device",
+        flags="---s",
+        inode=42,
+        path=None,
+        filesize=10,
+    )
+
+    # WHEN / THEN
+
+    assert not map.is_private()
+    assert not map.is_executable()
+    assert not map.is_readable()
+    assert not map.is_writable()
+    assert copy.copy(map) == map
+
+
+def test_virtual_map_path():
+    # GIVEN
+
+    map = VirtualMap(
+        start=0,
+        end=10,
+        offset=1234,
+        device="device",
+        flags="r--p",
+        inode=42,
+        path=Path("/usr/lib/libc-2.31.so"),
+        filesize=10,
+    )
+
+    # WHEN / THEN
+
+    assert map.path == "/usr/lib/libc-2.31.so"
+    assert map.path_obj == Path("/usr/lib/libc-2.31.so")
+    assert map.path_obj is map.path_obj
+    assert map == dataclasses.replace(map, path="/usr/lib/libc-2.31.so")
+
+
+def test_virtual_map_from_tuple():
+    # GIVEN
+
+    fields = (0, 10, 10, 1234, "device", "r--p", 42, "/usr/lib/libc-2.31.so")
+
+    # WHEN
+
+    map = VirtualMap._from_tuple(fields)
+
+    # THEN
+
+    assert map == VirtualMap(
+        start=0,
+        end=10,
+        offset=1234,
+        device="device",
+        flags="r--p",
+        inode=42,
+        path="/usr/lib/libc-2.31.so",
+        filesize=10,
+    )
+
+
 def test_simple_maps_no_such_pid():
     # GIVEN
 
@@ -46,16 +131,77 @@ def test_simple_maps_no_such_pid():
             list(generate_maps_for_process(1))
 
 
+def test_cached_maps():
+    # GIVEN
+
+    map_text = b"""
+7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
+    """
+    invalidate_maps()
+
+    # WHEN
+
+    with _fake_open(map_text) as open_mock:
+        first = list(generate_maps_for_process(1, use_cache=True))
+        second = list(generate_maps_for_process(1, use_cache=True))
+        uncached = list(generate_maps_for_process(1))
+        invalidate_maps(1)
+        third = list(generate_maps_for_process(1, use_cache=True))
+
+    # THEN
+
+    assert first == second == uncached == third
+    assert len(first) == 1
+    assert open_mock.call_count == 3
+    invalidate_maps()
+
+
+def test_cached_maps_no_such_pid():
+    # GIVEN
+
+    invalidate_maps()
+
+    with patch("builtins.open", side_effect=FileNotFoundError()):
+        # WHEN / THEN
+        with pytest.raises(ProcessNotFound):
+            list(generate_maps_for_process(1, use_cache=True))
+        with pytest.raises(ProcessNotFound):
+            list(generate_maps_for_process(1, use_cache=True))
+
+
+def test_maps_larger_than_scratch_buffer():
+    # GIVEN
+
+    map_text = b"""
+7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
+7f1ac1e50000-7f1ac1fc8000 r-xp 00025000 08:12 8398159                    /usr/lib/libc-2.31.so
+7f1ac1fc8000-7f1ac2012000 r--p 0019d000 08:12 8398159                    /usr/lib/libc-2.31.so
+    """
+
+    # WHEN
+
+    with _fake_open(map_text), patch("pystack.maps._SCRATCH", bytearray(64)):
+        maps = list(generate_maps_for_process(1))
+
+    # THEN
+
+    assert [(map.start, map.end) for map in maps] == [
+        (0x7F1AC1E2B000, 0x7F1AC1E50000),
+        (0x7F1AC1E50000, 0x7F1AC1FC8000),
+        (0x7F1AC1FC8000, 0x7F1AC2012000),
+    ]
+
+
 def test_simple_maps():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
     """
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -77,13 +223,13 @@ def test_simple_maps():
 def test_maps_with_long_device_numbers():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 7f1ac1e2b000-7f1ac1e50000 r--p 00000000 0123:4567 8398159 /usr/lib/libc-2.31.so
     """
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -105,13 +251,13 @@ def test_maps_with_long_device_numbers():
 def test_anonymous_maps():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159
     """
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -130,10 +276,66 @@ def test_anonymous_maps():
     ]
 
 
+def test_maps_with_spaces_in_path():
+    # GIVEN
+
+    map_text = b"""
+7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159    /some path/with spaces.so
+    """
+
+    # WHEN
+
+    with _fake_open(map_text):
+        maps = list(generate_maps_for_process(1))
+
+    # THEN
+
+    assert maps == [
+        VirtualMap(
+            start=139752898736128,
+            end=139752898887680,
+            filesize=151552,
+            offset=0,
+            device="08:12",
+            flags="r--p",
+            inode=8398159,
+            path=Path("/some path/with spaces.so"),
+        ),
+    ]
+
+
+def test_maps_with_deleted_files():
+    # GIVEN
+
+    map_text = b"""
+7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159    /usr/lib/libc-2.31.so (deleted)
+    """
+
+    # WHEN
+
+    with _fake_open(map_text):
+        maps = list(generate_maps_for_process(1))
+
+    # THEN
+
+    assert maps == [
+        VirtualMap(
+            start=139752898736128,
+            end=139752898887680,
+            filesize=151552,
+            offset=0,
+            device="08:12",
+            flags="r--p",
+            inode=8398159,
+            path=Path("/usr/lib/libc-2.31.so"),
+        ),
+    ]
+
+
 def test_map_permissions():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 7f1ac1e2b000-7f1ac1e50000 r--- 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
 7f1ac1e2b000-7f1ac1e50000 rw-- 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
 7f1ac1e2b000-7f1ac1e50000 rwx- 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
@@ -142,7 +344,7 @@ def test_map_permissions():
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -194,14 +396,14 @@ def test_map_permissions():
 def test_unexpected_line_is_ignored():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 I am an unexpected line
 7f1ac1e2b000-7f1ac1e50000 r--p 00000000 08:12 8398159                    /usr/lib/libc-2.31.so
     """
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -223,7 +425,7 @@ I am an unexpected line
 def test_special_maps():
     # GIVEN
 
-    map_text = """
+    map_text = b"""
 555f1ab1c000-555f1ab3d000 rw-p 00000000 00:00 0                          [heap]
 7ffdf8102000-7ffdf8124000 rw-p 00000000 00:00 0                          [stack]
 7ffdf8152000-7ffdf8155000 r--p 00000000 00:00 0                          [vvar]
@@ -233,7 +435,7 @@ ffffffffff600000-ffffffffff601000 --xp 00000000 00:00 0                  [vsysca
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     # THEN
@@ -826,6 +1028,109 @@ def test_maps_for_binary_range_vmaps_are_ignored():
     assert mapinfo.memory.max_addr == 2
 
 
+def test_maps_for_binary_find_map_by_address():
+    # GIVEN
+
+    first = VirtualMap(
+        start=10,
+        end=20,
+        filesize=10,
+        offset=0,
+        device="00:00",
+        flags="r-xp",
+        inode=0,
+        path=Path("the_executable"),
+    )
+    second = VirtualMap(
+        start=20,
+        end=30,
+        filesize=10,
+        offset=0,
+        device="00:00",
+        flags="rw-p",
+        inode=0,
+        path=None,
+    )
+    third = VirtualMap(
+        start=50,
+        end=60,
+        filesize=10,
+        offset=0,
+        device="00:00",
+        flags="r--p",
+        inode=0,
+        path=Path("/usr/lib/libc-2.31.so"),
+    )
+
+    # WHEN
+
+    mapinfo = parse_maps_file_for_binary(Path("the_executable"), [third, first, second])
+
+    # THEN
+
+    assert mapinfo.maps is not None
+    assert list(mapinfo.maps) == [first, second, third]
+    assert mapinfo.maps.find(5) is None
+    assert mapinfo.maps.find(10) == first
+    assert mapinfo.maps.find(19) == first
+    assert mapinfo.maps.find(20) == second
+    assert mapinfo.maps.find(30) is None
+    assert mapinfo.maps.find(59) == third
+    assert mapinfo.maps.find(60) is None
+    assert mapinfo.maps[1] == second
+    assert list(mapinfo.maps.find_all(FLAG_READ)) == [first, second, third]
+    assert list(mapinfo.maps.find_all(FLAG_READ | FLAG_WRITE)) == [second]
+    assert list(mapinfo.maps.find_all(FLAG_EXECUTE, "the_executable")) == [first]
+    assert list(mapinfo.maps.find_all(path="/usr/lib/libc-2.31.so")) == [third]
+
+
+def test_find_binary_map():
+    # GIVEN
+
+    anonymous = VirtualMap(
+        start=1,
+        end=2,
+        filesize=1,
+        offset=0,
+        device="00:00",
+        flags="rw-p",
+        inode=0,
+        path=None,
+    )
+    python = VirtualMap(
+        start=2,
+        end=3,
+        filesize=1,
+        offset=0,
+        device="00:00",
+        flags="r-xp",
+        inode=0,
+        path=Path("/usr/bin/the_executable"),
+    )
+    other_python = VirtualMap(
+        start=3,
+        end=4,
+        filesize=1,
+        offset=0,
+        device="00:00",
+        flags="r--p",
+        inode=0,
+        path=Path("/usr/bin/the_executable"),
+    )
+
+    maps = iter([anonymous, python, other_python])
+
+    # WHEN
+
+    found = find_binary_map(Path("the_executable"), maps)
+
+    # THEN
+
+    assert found == python
+    assert next(maps) == other_python
+    assert find_binary_map(Path("other_executable"), [python]) is None
+
+
 def test_maps_for_binary_no_binary_map():
     # GIVEN
 
@@ -1013,7 +1318,7 @@ def test_maps_for_binary_invalid_executable_and_no_available_maps():
 
 
 def test_maps_with_scattered_segments():
-    map_text = """
+    map_text = b"""
 00400000-00401000 r-xp 00000000 fd:00 67488961          /bin/python3.9-dbg
 00600000-00601000 r--p 00000000 fd:00 67488961          /bin/python3.9-dbg
 00601000-00602000 rw-p 00001000 fd:00 67488961          /bin/python3.9-dbg
@@ -1052,7 +1357,7 @@ ffffffffff600000-ffffffffff601000 r-xp 00000000 00:00 0 [vsyscall]
 
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=map_text)):
+    with _fake_open(map_text):
         maps = list(generate_maps_for_process(1))
 
     mapinfo = parse_maps_file_for_binary(Path("/bin/python3.9-dbg"), maps)
@@ -1099,3 +1404,30 @@ ffffffffff600000-ffffffffff601000 r-xp 00000000 00:00 0 [vsyscall]
         inode=0,
         path=Path("[heap]"),
     )
+
+
+def test_native_and_python_maps_parsers_agree():
+    # GIVEN
+
+    from pystack._pystack import parse_maps_data
+
+    map_text = b"""
+I am an unexpected line
+deadbeef is an unexpected line too
+00401000-00400000 r-xp 00000000 fd:00 67488961          /bin/python3.9-dbg
+00400000-00401000 r-xp 00000000 fd:00 67488961          /bin/python3.9-dbg
+0067b000-00a58000 rw-p 00000000 00:00 0                 [heap]
+7f7b38000000-7f7b38028000 rw-p 00000000 00:00 0
+7f7b46014000-7f7b46484000 r--p 0050b000 fd:00 1059871   /lib64/libpython3.9d.so.1.0
+7f1ac1e2b000-7f1ac1e50000 r--p 00000000 0123:4567 8398159 /some path/old.so (deleted)
+ffffffffff600000-ffffffffff601000 r-xp 00000000 00:00 0 [vsyscall]"""
+
+    # WHEN
+
+    native_maps = parse_maps_data(map_text)
+    python_maps = _parse_maps_data(map_text)
+
+    # THEN
+
+    assert len(native_maps) == 6
+    assert native_maps == python_maps
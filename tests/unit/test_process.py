@@ -1,5 +1,5 @@
+from io import BytesIO
 from unittest.mock import Mock
-from unittest.mock import mock_open
 from unittest.mock import patch
 
 import pytest
@@ -421,7 +421,7 @@ def test_scan_core_bss_for_python_version():
     )
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=memory)):
+    with patch("builtins.open", return_value=BytesIO(memory)):
         major, minor = scan_core_bss_for_python_version("corefile", bss)
 
     # THEN
@@ -446,7 +446,7 @@ def test_scan_core_bss_for_python_version_failure():
     )
     # WHEN
 
-    with patch("builtins.open", mock_open(read_data=memory)):
+    with patch("builtins.open", return_value=BytesIO(memory)):
         result = scan_core_bss_for_python_version("corefile", bss)
 
     # THEN